@@ -7,6 +7,8 @@ from one number to the next.
 import numpy as np
 import sys
 
+import safeint
+
 def count_increases(numlist):
     """Count number of times the measurements increase"""
     differences = numlist[1:] - numlist[:-1]
@@ -26,7 +28,9 @@ def main(filename):
     with open(filename, 'r') as datafile:
         numlist = datafile.read()
     numlist = numlist.splitlines()
-    numlist = np.array([int(i) for i in numlist])
+    # The window sums add three numbers and their differences subtract two of
+    # those so the numbers can get up to 6 times bigger
+    numlist = safeint.as_int_array([int(i) for i in numlist], growth=6)
     num_increases = count_increases(numlist)
     num_window_sum_increases = count_increases(find_window_sums(numlist))
     return num_increases, num_window_sum_increases
@@ -7,6 +7,8 @@ board to defeat the giant squid!
 import numpy as np
 import sys
 
+import safeint
+
 def masks(shape, include_diagonals=False):
     """A generator to get all valid bingo masks."""
     rows, cols = shape
@@ -105,9 +107,10 @@ def calculate_winning_board_score(board, marked_numbers):
     # Now there are 0s in all the marked spots and 1s in the unmarked spots.
     # Multiply the mask into the board to 0 out the marked numbers and then
     # find their sum.
-    board_sum = np.sum(board * mask)
+    board_sum = safeint.exact_sum(board * mask)
     # The score is this times the last number
-    return board_sum * marked_numbers[-1]
+    # Both are Python integers so this can't overflow
+    return board_sum * int(marked_numbers[-1])
 
 def load_data(filename):
     with open(filename, 'r') as datafile:
@@ -139,7 +142,9 @@ def clean_data(data):
         current_board = []
     # Once we've got all the boards, convert the board list to a numpy array
     # for hopefully easier use later
-    boards = np.array(board_list)
+    # The numbers on a board get added up when it is scored
+    boards = safeint.as_int_array(board_list,
+                                  growth=len(board_list[0]) * len(board_list[0][0]))
     return numbers, boards
 
 def main(filename):
@@ -0,0 +1,105 @@
+"""Exact integer arithmetic with NumPy
+
+NumPy's default int64 arrays silently wrap around when the numbers get too big.
+The functions here look at how big the numbers are after parsing and only use
+int64 arrays when the results are guaranteed to fit. Otherwise, they fall back
+to object arrays (which hold Python integers) or to summing in chunks that each
+fit in int64 so that the answers are always exact.
+
+Running this file directly runs a benchmark to check that the int64 fast paths
+are just as fast as plain NumPy.
+"""
+
+import sys
+import time
+import numpy as np
+
+INT64_MAX = np.iinfo(np.int64).max
+
+def int_dtype(max_abs_value, growth=1):
+    """Return the dtype to use for some integers
+
+    This function accepts the largest absolute value of the integers and how
+    much bigger (as a factor) the results of the computations on them can get.
+    It returns np.int64 if the results are guaranteed to fit in 64 bits and
+    object (Python integers) otherwise.
+    """
+    if max_abs_value * growth <= INT64_MAX:
+        return np.int64
+    return object
+
+def as_int_array(values, growth=1):
+    """Convert parsed integers into an array that won't overflow
+
+    This function accepts a (possibly nested) list of integers and how much
+    bigger (as a factor) the results of the computations on them can get. It
+    returns an int64 array if the results are guaranteed to fit in 64 bits and
+    an object array of Python integers otherwise.
+    """
+    try:
+        array = np.array(values, dtype=np.int64)
+    except OverflowError:
+        # The values themselves don't even fit in 64 bits
+        return np.array(values, dtype=object)
+    if not array.size:
+        return array
+    # Use the largest of the two extremes instead of np.abs() since the
+    # absolute value of the smallest int64 doesn't fit in an int64
+    max_abs_value = max(int(array.max()), -int(array.min()))
+    if int_dtype(max_abs_value, growth) is np.int64:
+        return array
+    return array.astype(object)
+
+def exact_sum(array, max_abs_value=None):
+    """Return the exact sum of an integer array as a Python integer
+
+    The sizes of the numbers are only checked once, when they are parsed with
+    as_int_array(). If the array came from as_int_array() with a growth of at
+    least its size (or from computations on one that don't make the numbers
+    any bigger), an int64 array is already known to sum without overflowing,
+    so this is just a single array.sum(). For any other int64 array, pass the
+    largest absolute value in it as max_abs_value. If the sum could then
+    overflow, the array is summed in chunks whose sums each fit in 64 bits and
+    the chunk sums are added up as Python integers. Object arrays are always
+    summed as Python integers in chunks.
+    """
+    array = np.asarray(array).ravel()
+    if array.dtype == object:
+        chunk_size = 1 << 16
+        return sum(sum(array[i:i+chunk_size].tolist())
+                   for i in range(0, array.size, chunk_size))
+    if (max_abs_value is None
+            or int_dtype(max_abs_value, array.size) is np.int64):
+        return int(array.sum(dtype=np.int64))
+    # Pick the chunk size so that every chunk's sum fits in 64 bits
+    chunk_size = max(INT64_MAX // max(max_abs_value, 1), 1)
+    return sum(int(array[i:i+chunk_size].sum(dtype=np.int64))
+               for i in range(0, array.size, chunk_size))
+
+def benchmark(size=10000000, repeats=5):
+    """Compare the int64 fast paths against plain NumPy
+
+    This function times as_int_array() against np.array() and exact_sum()
+    against np.sum() on small numbers (where the fast paths are used) and
+    prints the best time for each.
+    """
+    values_list = np.random.default_rng(0).integers(-1000, 1000,
+                                                    size=size).tolist()
+    values = as_int_array(values_list, growth=size)
+    cases = [
+            ('np.array', lambda: np.array(values_list, dtype=np.int64)),
+            ('as_int_array', lambda: as_int_array(values_list, growth=size)),
+            ('np.sum', lambda: values.sum()),
+            ('exact_sum', lambda: exact_sum(values)),
+            ]
+    for name, function in cases:
+        times = []
+        for _ in range(repeats):
+            start_time = time.perf_counter()
+            function()
+            times.append(time.perf_counter() - start_time)
+        print(f'{name}: {min(times):.4f} s')
+
+if __name__ == "__main__":
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 10000000
+    benchmark(size)
@@ -3,6 +3,93 @@
 import sys
 import numpy as np
 
+# The "digits" that can show up in the strings along with their values
+DIGIT_WORDS = {
+        "0": 0, "1": 1, "2": 2, "3": 3, "4": 4, "5": 5, "6": 6, "7": 7, "8": 8,
+        "9": 9, "zero": 0, "one": 1, "two": 2, "three": 3, "four": 4,
+        "five": 5, "six": 6, "seven": 7, "eight": 8, "nine": 9,
+        }
+
+def build_digit_automaton(words):
+    """Build an Aho-Corasick automaton to find words in a string
+
+    This function accepts a dict mapping words to their values and returns an
+    automaton that can find all of them in a single pass over a string. The
+    automaton is returned as a tuple of three lists indexed by state (state 0
+    is the start):
+    - transitions: a dict mapping each character to the next state (any
+      character not in the dict goes back to state 0)
+    - longest: the (length, value) of the longest word that ends when this
+      state is reached, or None if no word ends here
+    - shortest: the same as longest but for the shortest word
+    Since overlapping words are all reported, something like "twone" will
+    match both "two" and "one".
+    """
+    # First build a trie of all the words
+    transitions = [{}]
+    matches = [[]]  # The (length, value) of the words ending at each state
+    for word, value in words.items():
+        state = 0
+        for char in word:
+            if char not in transitions[state]:
+                transitions.append({})
+                matches.append([])
+                transitions[state][char] = len(transitions) - 1
+            state = transitions[state][char]
+        matches[state].append((len(word), value))
+    # Now go through the trie breadth first, working out where to go when a
+    # character doesn't continue the current word (the failure links)
+    # Each state gets all the transitions of its failure state that it doesn't
+    # already have so that the automaton never needs to backtrack
+    failure = [0] * len(transitions)
+    queue = list(transitions[0].values())
+    for state in queue:
+        for char, next_state in transitions[state].items():
+            queue.append(next_state)
+            if state:
+                failure[next_state] = transitions[failure[state]].get(char, 0)
+        if state:
+            # Any word that ends at the failure state also ends here
+            matches[state].extend(matches[failure[state]])
+            for char, next_state in transitions[failure[state]].items():
+                transitions[state].setdefault(char, next_state)
+    longest = [max(m) if m else None for m in matches]
+    shortest = [min(m) if m else None for m in matches]
+    return transitions, longest, shortest
+
+DIGIT_AUTOMATON = build_digit_automaton(DIGIT_WORDS)
+
+def extract_real_calibration_values_automaton(strings):
+    """Extract "real" calibration values for each string in the list of strings
+
+    This function does the same thing as extract_real_calibration_values() but
+    uses DIGIT_AUTOMATON to find the first and last "digit" in a single pass
+    over each string instead of searching for every "digit" separately. A
+    string that doesn't have any "digits" gets a calibration value of 0.
+    """
+    transitions, longest, shortest = DIGIT_AUTOMATON
+    calibration_values = []
+    for string in strings:
+        state = 0
+        first_start = last_start = None
+        tens = ones = 0
+        for i, char in enumerate(string):
+            state = transitions[state].get(char, 0)
+            if longest[state] is None:
+                continue
+            # The longest word ending here starts the earliest and the
+            # shortest one starts the latest
+            length, value = longest[state]
+            if first_start is None or i - length < first_start:
+                first_start = i - length
+                tens = value
+            length, value = shortest[state]
+            if last_start is None or i - length >= last_start:
+                last_start = i - length
+                ones = value
+        calibration_values.append(10 * tens + ones)
+    return calibration_values
+
 def extract_real_calibration_values(strings):
     """Extract "real" calibration values for each string in the list of strings
 
@@ -82,6 +169,41 @@ def extract_calibration_values(strings):
             ]
     return calibration_values
 
+def extract_calibration_values_buffer(buffer):
+    """Extract calibration values for every line in a bytes buffer
+
+    This function does the same thing as extract_calibration_values() but
+    works on the whole input at once. It accepts the raw contents of the input
+    as bytes (lines separated by newlines) and views them as a NumPy uint8
+    array. The positions of all the ASCII digits are found using a mask, each
+    digit is assigned to its line by counting the newlines before it, and the
+    first and last digit of each line are picked out where the line number
+    changes. It returns a NumPy array of calibration values with one entry per
+    line. Lines without any digits get a calibration value of 0.
+    """
+    data = np.frombuffer(buffer, dtype=np.uint8)
+    newlines = np.flatnonzero(data == ord('\n'))
+    num_lines = len(newlines)
+    if len(data) and data[-1] != ord('\n'):
+        # The last line doesn't end with a newline
+        num_lines += 1
+    calibration_values = np.zeros(num_lines, dtype=np.int64)
+    digit_positions = np.flatnonzero((data >= ord('0')) & (data <= ord('9')))
+    if not len(digit_positions):
+        return calibration_values
+    # The line a digit is on is the number of newlines before it
+    line_numbers = np.searchsorted(newlines, digit_positions)
+    # The first digit on a line is the one where the line number changes from
+    # the digit before it and the last digit is the one where it changes to
+    # the digit after it
+    line_changes = line_numbers[1:] != line_numbers[:-1]
+    is_first = np.concatenate(([True], line_changes))
+    is_last = np.concatenate((line_changes, [True]))
+    digits = data[digit_positions].astype(np.int64) - ord('0')
+    calibration_values[line_numbers[is_first]] = (10 * digits[is_first]
+                                                  + digits[is_last])
+    return calibration_values
+
 def main(filename):
     with open(filename, 'r') as infile:
         data = infile.read()
@@ -90,7 +212,7 @@ def main(filename):
         calibration_values = extract_calibration_values(data)
     except IndexError:
         calibration_values = []
-    real_calibration_values = extract_real_calibration_values(data)
+    real_calibration_values = extract_real_calibration_values_automaton(data)
     return calibration_values, real_calibration_values
 
 if __name__ == "__main__":
@@ -1,31 +1,31 @@
 """Day 04: Scratchcards"""
 
-import re
 import sys
+import numpy as np
+
+def numbers_to_bitset(numbers):
+    """Convert a string of numbers into a bitset
+
+    This function takes in a string of space separated (non-negative) numbers
+    and returns an integer that has the bit for each of those numbers set.
+    Since the numbers on the cards are all less than 100, this fits in 128
+    bits.
+    """
+    bitset = 0
+    for number in numbers.split():
+        bitset |= 1 << int(number)
+    return bitset
 
 def count_number_of_wins(card):
     """Count how many wins are on this card
 
     This function takes in a card's details and computes how many wins there
     are. The card details are a list-like that contains the card number, the
-    winning numbers, and the actual numbers.
+    winning numbers, and the actual numbers. The numbers are stored as bitsets
+    (see numbers_to_bitset()) so the wins are just the number of bits that are
+    set in both of them.
     """
-    num_winning_nums = 0
-    # Get a list of the winning numbers on the card
-    # Remember that these are space separated
-    for winning_number in card[1].strip().split(' '):
-        if not winning_number:
-            # if the string is empty, just skip over it
-            continue
-        # Check if the winning number is in the actual numbers
-        # We need to make sure winning_number is found exactly in the actual
-        # list of numbers. This means ensuring that the value found in the
-        # actual list of numbers is either separated from the other numbers by
-        # spaces or is at the start / end of the list of numbers (where it may
-        # not have a space next to it).
-        if re.search(r'(\D|^)' + winning_number + r'(\D|$)', card[2]):
-            num_winning_nums += 1
-    return num_winning_nums
+    return (card[1] & card[2]).bit_count()
 
 def compute_number_of_scratchcards(cards):
     """Compute the number of scratchcards won
@@ -46,6 +46,38 @@ def compute_number_of_scratchcards(cards):
             num_cards[j] += num_cards_added
     return num_cards
 
+def propagate_scratchcards(num_wins):
+    """Compute the number of scratchcards won from the number of wins
+
+    This function does the same thing as compute_number_of_scratchcards() but
+    takes in a NumPy array (or list) of the number of wins on each card instead
+    of the cards themselves. Instead of adding each card's copies to each of
+    the cards it wins, it keeps a difference array: the copies of a card are
+    added at the first card it wins and subtracted again just after the last
+    one. A running sum of the difference array then gives the number of copies
+    each card has won, so each card is only touched once no matter how many
+    wins it has. Wins that run past the last card are ignored. It returns a
+    list of how many of each scratchcard were won.
+    """
+    num_wins = np.asarray(num_wins, dtype=np.int64)
+    num_total_cards = len(num_wins)
+    # Work out where each card's contribution stops (exclusive)
+    ends = np.minimum(np.arange(1, num_total_cards + 1) + num_wins,
+                      num_total_cards)
+    # The number of copies can grow very quickly so do the sums with Python
+    # integers
+    difference = [0] * (num_total_cards + 1)
+    num_cards = [0] * num_total_cards
+    copies_won = 0
+    for i, end in enumerate(ends.tolist()):
+        copies_won += difference[i]
+        # Start with 1 copy of every card (the original)
+        num_cards[i] = 1 + copies_won
+        if end > i + 1:
+            difference[i + 1] += num_cards[i]
+            difference[end] -= num_cards[i]
+    return num_cards
+
 def compute_points(cards):
     """Compute points for each scratchcard
 
@@ -69,8 +101,13 @@ def parse_data(data):
         # Now get the winning_numbers and the actual numbers
         # These two parts are separated by a pipe and the each of the
         # individual numbers are space separated
+        # Store them as bitsets so that they're easy to compare later
         winning_numbers, actual_numbers = card.split('|')
-        cards.append((card_number, winning_numbers.strip(), actual_numbers.strip()))
+        cards.append((
+            card_number,
+            numbers_to_bitset(winning_numbers),
+            numbers_to_bitset(actual_numbers),
+            ))
     return cards
 
 def read_data(filename):
@@ -85,7 +122,8 @@ def main(filename):
     cards = parse_data(cards)
     points = compute_points(cards)
     print(f'Total points: {sum(points)}')
-    num_cards = compute_number_of_scratchcards(cards)
+    num_wins = [count_number_of_wins(card) for card in cards]
+    num_cards = propagate_scratchcards(num_wins)
     print(f'Total cards: {sum(num_cards)}')
 
 if __name__ == "__main__":
@@ -1,6 +1,20 @@
 """Day 05: If You Give A Seed A Fertilizer"""
 
+import bisect
+import math
 import sys
+import numpy as np
+
+# The order in which the maps need to be applied to go from seed to location
+MAP_NAMES = (
+        'seed-to-soil map',
+        'soil-to-fertilizer map',
+        'fertilizer-to-water map',
+        'water-to-light map',
+        'light-to-temperature map',
+        'temperature-to-humidity map',
+        'humidity-to-location map',
+        )
 
 def convert(number, mapping):
     """Convert a number using a mapping
@@ -25,15 +39,60 @@ def seed2location(seed_number, mappings):
     start).
     """
     num = seed_number
-    num = convert(num, mappings['seed-to-soil map'])
-    num = convert(num, mappings['soil-to-fertilizer map'])
-    num = convert(num, mappings['fertilizer-to-water map'])
-    num = convert(num, mappings['water-to-light map'])
-    num = convert(num, mappings['light-to-temperature map'])
-    num = convert(num, mappings['temperature-to-humidity map'])
-    num = convert(num, mappings['humidity-to-location map'])
+    for name in MAP_NAMES:
+        num = convert(num, mappings[name])
     return num
 
+def convert_ranges(ranges, mapping):
+    """Convert a list of ranges using a mapping
+
+    This function does the same thing as convert() but, instead of a single
+    number, it takes in a list of (start, end) tuples (both inclusive) and
+    converts all the numbers in those ranges at once. Any range that straddles
+    the boundary of a mapping entry is split up at that boundary so that each
+    piece can be shifted by the right amount. The returned list contains the
+    converted (start, end) tuples. It is not sorted or merged.
+    """
+    converted = []
+    # Keep a stack of ranges that still need to be matched against the mapping
+    pending = list(ranges)
+    while pending:
+        start, end = pending.pop()
+        for source_start, source_end, dest_start in mapping:
+            # Find the overlap between this range and the mapping entry
+            overlap_start = max(start, source_start)
+            overlap_end = min(end, source_end)
+            if overlap_start > overlap_end:
+                # No overlap so try the next entry
+                continue
+            # The overlap gets shifted to the destination
+            shift = dest_start - source_start
+            converted.append((overlap_start + shift, overlap_end + shift))
+            # Whatever sticks out on either side still needs to be matched
+            # against the other entries
+            if start < overlap_start:
+                pending.append((start, overlap_start - 1))
+            if overlap_end < end:
+                pending.append((overlap_end + 1, end))
+            break
+        else:
+            # None of the mappings matched so this range maps to itself
+            converted.append((start, end))
+    return converted
+
+def seed_ranges2location_ranges(seed_ranges, mappings):
+    """Convert a list of seed ranges to location ranges
+
+    This function is the range equivalent of seed2location(). It takes in a
+    list of (start, end) tuples (both inclusive) describing ranges of seed
+    numbers and pushes them through all the mappings. It returns a list of
+    (start, end) tuples of location numbers.
+    """
+    ranges = list(seed_ranges)
+    for name in MAP_NAMES:
+        ranges = convert_ranges(ranges, mappings[name])
+    return ranges
+
 def find_lowest_location_number(seeds, mappings):
     """Find the lowest location number for the seeds
 
@@ -48,6 +107,183 @@ def find_lowest_location_number(seeds, mappings):
             lowest_location = location
     return lowest_location
 
+def batch_convert(numbers, mapping):
+    """Convert an array of numbers using a mapping
+
+    This function does the same thing as convert() but works on a whole NumPy
+    array of numbers at once. The mapping entries are sorted by their source
+    range start so that np.searchsorted can find the only entry each number
+    could fall in. Numbers that are not inside that entry map back to
+    themselves. The entries in the mapping are assumed to not overlap, which is
+    true for the almanac.
+    """
+    numbers = np.asarray(numbers, dtype=np.int64)
+    if not mapping:
+        return numbers.copy()
+    entries = np.array(sorted(mapping), dtype=np.int64)
+    source_starts = entries[:, 0]
+    source_ends = entries[:, 1]
+    offsets = entries[:, 2] - source_starts
+    # Find the last entry that starts at or before each number
+    idx = np.searchsorted(source_starts, numbers, side='right') - 1
+    # Numbers before the first entry get idx = -1 so clip it to make the
+    # lookups below valid and then mask those numbers out
+    clipped_idx = np.maximum(idx, 0)
+    in_entry = (idx >= 0) & (numbers <= source_ends[clipped_idx])
+    return numbers + np.where(in_entry, offsets[clipped_idx], 0)
+
+def batch_seed2location(seed_numbers, mappings):
+    """Convert an array of seed numbers to location numbers
+
+    This function does the same thing as seed2location() but uses
+    batch_convert() to convert a whole NumPy array of seed numbers at once.
+    """
+    numbers = np.asarray(seed_numbers, dtype=np.int64)
+    for name in MAP_NAMES:
+        numbers = batch_convert(numbers, mappings[name])
+    return numbers
+
+def find_lowest_location_number_batch(seeds, mappings):
+    """Find the lowest location number for an array of seeds
+
+    This function does the same thing as find_lowest_location_number() but
+    uses batch_seed2location() to convert all the seeds at once.
+    """
+    locations = batch_seed2location(seeds, mappings)
+    if not locations.size:
+        return None
+    return int(locations.min())
+
+def compile_mapping(mapping):
+    """Compile a mapping into a sorted list of segments
+
+    This function takes in a mapping (a list of (source range start, source
+    range end, destination range start) tuples) and converts it into a list of
+    (start, offset) tuples sorted by start. Each segment starts at its start
+    number and runs up to the number before the start of the next segment (or
+    forever for the last one). A number in a segment is converted by adding the
+    offset to it. The gaps between the mapping entries are filled in with
+    segments that have an offset of 0 so that the segments cover all numbers
+    from 0 upwards. The entries in the mapping are assumed to not overlap,
+    which is true for the almanac.
+    """
+    segments = []
+    position = 0  # The first number that is not covered by a segment yet
+    for source_start, source_end, dest_start in sorted(mapping):
+        if position < source_start:
+            # Fill the gap before this entry with an identity segment
+            segments.append((position, 0))
+        segments.append((source_start, dest_start - source_start))
+        position = source_end + 1
+    # Everything after the last entry maps to itself
+    segments.append((position, 0))
+    return _merge_segments(segments)
+
+def _merge_segments(segments):
+    """Merge neighboring segments that have the same offset
+
+    This function takes in a sorted list of (start, offset) segments and
+    removes any segment that has the same offset as the one before it since
+    the two of them together act like a single segment. Empty segments (that
+    start at the same number as the next one) are dropped too.
+    """
+    merged = []
+    for start, offset in segments:
+        if merged and merged[-1][0] == start:
+            # The previous segment is empty
+            merged.pop()
+        if merged and merged[-1][1] == offset:
+            continue
+        merged.append((start, offset))
+    return merged
+
+def compose_segments(first, second):
+    """Compose two lists of segments into one
+
+    This function takes in two lists of (start, offset) segments (see
+    compile_mapping()) and returns a single list of segments that does the same
+    thing as converting a number using the first list and then converting the
+    result using the second list.
+    """
+    second_starts = [start for start, _ in second]
+    composed = []
+    for i, (start, offset) in enumerate(first):
+        end = first[i + 1][0] - 1 if i + 1 < len(first) else math.inf
+        # This segment sends [start, end] to [start + offset, end + offset]
+        # Find the segment of the second list that the start ends up in
+        j = bisect.bisect_right(second_starts, start + offset) - 1
+        composed.append((start, offset + second[j][1]))
+        # Now split this segment wherever the image crosses into the next
+        # segment of the second list
+        for second_start, second_offset in second[j + 1:]:
+            if second_start > end + offset:
+                break
+            composed.append((second_start - offset, offset + second_offset))
+    return _merge_segments(composed)
+
+def compile_almanac(mappings):
+    """Compile all the mappings into a single seed to location lookup
+
+    This function composes all the mappings (in the order described by
+    MAP_NAMES) into a single list of segments that converts seed numbers
+    directly to location numbers. To make lookups fast, the segments are
+    returned as a tuple of two lists: the segment starts and the segment
+    offsets. The compiled almanac can be reused with compiled_seed2location()
+    for as many seeds as needed.
+    """
+    segments = [(0, 0)]
+    for name in MAP_NAMES:
+        segments = compose_segments(segments, compile_mapping(mappings[name]))
+    starts = [start for start, _ in segments]
+    offsets = [offset for _, offset in segments]
+    return starts, offsets
+
+def compiled_seed2location(seed_number, almanac):
+    """Convert a seed number to a location number using a compiled almanac
+
+    This function does the same thing as seed2location() but uses an almanac
+    compiled with compile_almanac(). Each conversion is a single binary search
+    no matter how many mappings there are.
+    """
+    starts, offsets = almanac
+    return seed_number + offsets[bisect.bisect_right(starts, seed_number) - 1]
+
+def find_lowest_location_number_compiled(seeds, almanac):
+    """Find the lowest location number for the seeds
+
+    This function does the same thing as find_lowest_location_number() but
+    uses an almanac compiled with compile_almanac().
+    """
+    return min((compiled_seed2location(seed, almanac) for seed in seeds),
+               default=None)
+
+def find_lowest_location_number_from_ranges(seed_ranges, mappings):
+    """Find the lowest location number for ranges of seeds
+
+    This function does the same thing as find_lowest_location_number() but
+    works with a list of (start, end) tuples of seed numbers instead of
+    individual seeds. Since whole ranges are converted at once, the time this
+    takes only depends on the number of ranges and mapping entries and not on
+    how many seeds there are in the ranges.
+    """
+    location_ranges = seed_ranges2location_ranges(seed_ranges, mappings)
+    if not location_ranges:
+        return None
+    return min(start for start, _ in location_ranges)
+
+def pair_seed_ranges(seed_ranges):
+    """Return a list of (start, end) tuples of seed numbers
+
+    This function takes in the same list of numbers as expand_seed_list() but,
+    instead of expanding the ranges into individual seed numbers, it returns
+    each range as a (start, end) tuple (both inclusive). Empty ranges are
+    dropped.
+    """
+    seed_ranges = iter(seed_ranges)
+    return [(start, start + length - 1)
+            for start, length in zip(seed_ranges, seed_ranges)
+            if length > 0]
+
 def expand_seed_list(seed_ranges):
     """Return a generator of seed numbers
 
@@ -114,9 +350,13 @@ def read_data(filename):
 def main(filename):
     data = read_data(filename)
     seeds, maps = parse_data(data)
-    min_location = find_lowest_location_number(seeds, maps)
+    almanac = compile_almanac(maps)
+    min_location = find_lowest_location_number_compiled(seeds, almanac)
     print(f'Lowest location number of seed list: {min_location}')
-    min_location = find_lowest_location_number(expand_seed_list(seeds), maps)
+    min_location = find_lowest_location_number_from_ranges(
+            pair_seed_ranges(seeds),
+            maps,
+            )
     print(f'Lowest location number of expanded seed list: {min_location}')
     return seeds, maps
 
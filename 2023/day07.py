@@ -1,8 +1,24 @@
 """Day 07: Camel Cards"""
 
-import functools
+from collections import Counter
 import re
 import sys
+import numpy as np
+
+# The value of each card without and with jokers (see get_card_value())
+CARD_VALUES = {card: value for value, card in enumerate('23456789TJQKA', 2)}
+CARD_VALUES_WITH_JOKERS = dict(CARD_VALUES, J=1)
+# The hand type (see get_hand_type()) for each multiset of card counts, with the
+# counts sorted from largest to smallest
+HAND_TYPES = {
+        (5, ): 6,
+        (4, 1): 5,
+        (3, 2): 4,
+        (3, 1, 1): 3,
+        (2, 2, 1): 2,
+        (2, 1, 1, 1): 1,
+        (1, 1, 1, 1, 1): 0,
+        }
 
 def get_card_value(card, jokers):
     """Return the value of a card
@@ -68,6 +84,35 @@ def get_hand_type(hand, jokers):
     # If nothing matches, we just have a high card
     return 0
 
+def get_hand_type_from_counts(hand, jokers):
+    """Get the type of a hand from how many of each card it has
+
+    This function returns the same thing as get_hand_type() but works it out
+    by counting how many of each card there are in the hand. With jokers, the
+    jokers are always best used by adding them to whichever card there is the
+    most of.
+    """
+    counts = Counter(hand)
+    num_jokers = counts.pop('J', 0) if jokers else 0
+    counts = sorted(counts.values(), reverse=True) or [0]
+    counts[0] += num_jokers
+    return HAND_TYPES[tuple(counts)]
+
+def get_hand_key(hand, jokers):
+    """Return a single integer that can be used to sort hands
+
+    This function packs the type of the hand into the highest bits of an
+    integer followed by the value of each card in the hand (4 bits each, in
+    order). Comparing these integers gives the same result as compare_hands(),
+    so hands can be sorted using this as the key and each hand only needs to be
+    looked at once.
+    """
+    card_values = CARD_VALUES_WITH_JOKERS if jokers else CARD_VALUES
+    key = get_hand_type_from_counts(hand, jokers)
+    for card in hand:
+        key = (key << 4) | card_values[card]
+    return key
+
 def compare_hands(h1, h2, jokers):
     """Compare two hands
 
@@ -105,28 +150,84 @@ def compute_winnings(hands, bids, jokers):
     This function takes a list of hands and ranks them. It then computes the
     winnings by multiplying each hand's bid with it's rank.
     """
-    # Not sure if there is a better way of doing this but I got a little tired
-    # trying to figure out if there was a better way and I couldn't get
-    # compare_hands() to work in the key argument to sorted when it was just
-    # applied to the list of bids
-    def _compare_bids_using_hands(bid1, bid2):
-        """Compare two bids using their hands
-
-        This function takes in two bids. Each bid is a tuple that contains the
-        bid amount and the hand that it was bid on. It then "sorts" them in
-        based on the hands.
-        """
-        return compare_hands(bid1[1], bid2[1], jokers=jokers)
-    sorted_bids, _ = zip(*sorted(
-        zip(bids, hands),
-        key=functools.cmp_to_key(_compare_bids_using_hands)
-        ))
+    # Convert each hand into its integer key once and sort the bids by those
+    # keys (see get_hand_key())
+    # Only sort on the keys so that identical hands keep their original order
+    keys = [get_hand_key(hand, jokers) for hand in hands]
+    sorted_bids = [bid for _, bid in sorted(zip(keys, bids),
+                                            key=lambda pair: pair[0])]
     # Now compute the winnings by multiplying the bids by the rank
     # In this case, since we have a sorted list of bids in increasing order by
     # rank, the rank is just the index of the bid + 1 (because the list starts
     # at index 0)
     return sum((i + 1) * bid for i, bid in enumerate(sorted_bids))
 
+def encode_hands(hands, jokers):
+    """Encode a list of hands as a matrix of card values
+
+    This function accepts a list of hands (as strings) and returns a uint8
+    NumPy array with one row per hand and one column per card, holding the
+    value of each card (see get_card_value()).
+    """
+    card_values = CARD_VALUES_WITH_JOKERS if jokers else CARD_VALUES
+    # Build a lookup table from the ASCII code of each card to its value
+    lookup = np.zeros(256, dtype=np.uint8)
+    for card, value in card_values.items():
+        lookup[ord(card)] = value
+    chars = np.frombuffer(''.join(hands).encode('ascii'), dtype=np.uint8)
+    # Every hand has 5 cards
+    return lookup[chars].reshape((len(hands), 5))
+
+def compute_hand_keys_batch(card_values, jokers):
+    """Compute the sort keys for a matrix of hands
+
+    This function does the same thing as get_hand_key() but for all the hands
+    in a matrix of card values (see encode_hands()) at once. It returns a
+    uint32 NumPy array of keys, one for each hand.
+    """
+    # For each card, count how many cards in the hand match it (including
+    # itself)
+    matches = card_values[:, :, None] == card_values[:, None, :]
+    if jokers:
+        # Jokers (value 1) don't count as matching anything here
+        not_jokers = card_values != 1
+        matches &= not_jokers[:, :, None] & not_jokers[:, None, :]
+    group_sizes = matches.sum(axis=2, dtype=np.int64)
+    # Adding up the group size of every card gives the sum of the squares of
+    # the counts of each card value, which is different for every type
+    scores = group_sizes.sum(axis=1)
+    if jokers:
+        # Jokers are always best used by adding them to the largest group,
+        # which turns its m**2 into (m + num_jokers)**2
+        num_jokers = card_values.shape[1] - not_jokers.sum(axis=1)
+        largest_group = group_sizes.max(axis=1)
+        scores += 2 * largest_group * num_jokers + num_jokers ** 2
+    # Look up the type for each score (see HAND_TYPES)
+    score_types = np.zeros(26, dtype=np.uint32)
+    for counts, hand_type in HAND_TYPES.items():
+        score_types[sum(count ** 2 for count in counts)] = hand_type
+    hand_types = score_types[scores]
+    # Pack the type and the card values into one key
+    keys = hand_types
+    for column in range(card_values.shape[1]):
+        keys = (keys << 4) | card_values[:, column].astype(np.uint32)
+    return keys
+
+def compute_winnings_batch(hands, bids, jokers):
+    """Compute the winnings from all hands using NumPy
+
+    This function does the same thing as compute_winnings() but ranks all the
+    hands with NumPy. The hands are encoded into a matrix, converted into keys
+    (see compute_hand_keys_batch()), and ranked with a stable argsort so that
+    identical hands keep their original order. The winnings are then the dot
+    product of the sorted bids with the ranks.
+    """
+    keys = compute_hand_keys_batch(encode_hands(hands, jokers), jokers)
+    order = np.argsort(keys, kind='stable')
+    bids = np.asarray(bids, dtype=np.int64)
+    ranks = np.arange(1, len(bids) + 1, dtype=np.int64)
+    return int(bids[order] @ ranks)
+
 def parse_data(data):
     """Parse the data to make it usable"""
     hands = []
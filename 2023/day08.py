@@ -1,7 +1,10 @@
 """Day 08: Haunted Wasteland"""
 
+import itertools as it
+import math
 import re
 import sys
+import numpy as np
 
 def navigate(directions, maze):
     """Navigate through the maze
@@ -32,6 +35,218 @@ def navigate(directions, maze):
             break
     return num_steps
 
+def find_ghost_cycle(directions, maze, start_node):
+    """Find the cycle a ghost ends up in
+
+    This function takes in the list of directions, the maze dict (see
+    navigate()), and a starting node. Since the directions repeat, the state
+    of a ghost is its current node along with how far it is through the list
+    of directions. There are only so many states, so the ghost eventually
+    lands in a state it has been in before and then loops around forever.
+
+    It returns a tuple of:
+    - the step at which the cycle starts
+    - the length of the cycle
+    - the steps before the cycle at which the ghost is on a node ending in Z
+    - the steps within the first pass of the cycle at which the ghost is on a
+      node ending in Z
+    """
+    seen = {}
+    z_steps = []
+    node = start_node
+    step = 0
+    while (state := (node, step % len(directions))) not in seen:
+        seen[state] = step
+        if node.endswith('Z'):
+            z_steps.append(step)
+        node = maze[node][directions[step % len(directions)]]
+        step += 1
+    cycle_start = seen[state]
+    cycle_length = step - cycle_start
+    pre_cycle_z_steps = [s for s in z_steps if s < cycle_start]
+    cycle_z_steps = [s for s in z_steps if s >= cycle_start]
+    return cycle_start, cycle_length, pre_cycle_z_steps, cycle_z_steps
+
+def _is_z_step(cycle, step):
+    """Check if a ghost is on a node ending in Z after a number of steps
+
+    This function takes in the cycle of a ghost (see find_ghost_cycle()) and
+    the number of steps and returns whether the ghost is on a node ending in Z
+    at that step.
+    """
+    cycle_start, cycle_length, pre_cycle_z_steps, cycle_z_steps = cycle
+    if step < cycle_start:
+        return step in pre_cycle_z_steps
+    return (step - cycle_start) % cycle_length + cycle_start in cycle_z_steps
+
+def _combine_congruences(remainder1, modulus1, remainder2, modulus2):
+    """Combine two congruences into one
+
+    This function finds all the numbers x such that x = remainder1 (mod
+    modulus1) and x = remainder2 (mod modulus2) using the Chinese remainder
+    theorem (the moduli don't need to be coprime). It returns them as a tuple
+    (remainder, modulus), where the modulus is the LCM of the two moduli, or
+    None if there aren't any such numbers.
+    """
+    gcd = math.gcd(modulus1, modulus2)
+    if (remainder2 - remainder1) % gcd:
+        return None
+    reduced_modulus2 = modulus2 // gcd
+    # Find k so that remainder1 + modulus1 * k = remainder2 (mod modulus2)
+    k = ((remainder2 - remainder1) // gcd
+         * pow(modulus1 // gcd, -1, reduced_modulus2)) % reduced_modulus2
+    modulus = modulus1 * reduced_modulus2
+    return (remainder1 + modulus1 * k) % modulus, modulus
+
+def navigate_ghosts(directions, maze):
+    """Navigate through the maze as a ghost
+
+    This function takes in the list of directions and the maze dict (see
+    navigate()). It starts at every node ending in A at the same time and
+    returns the number of steps it takes until all of them are on nodes ending
+    in Z at the same time (or None if that never happens).
+
+    Instead of stepping through the maze, it finds the cycle each starting node
+    ends up in (see find_ghost_cycle()). The steps at which a ghost is on a Z
+    node within its cycle repeat every cycle length, so the answer is found by
+    combining these with the Chinese remainder theorem (which is just the LCM
+    of the cycle lengths when the Z nodes are at the end of the cycles). Any Z
+    nodes seen before the cycles start are checked separately.
+    """
+    start_nodes = [node for node in maze if node.endswith('A')]
+    cycles = [find_ghost_cycle(directions, maze, node) for node in start_nodes]
+    if not cycles:
+        return None
+    # Every ghost is only in its cycle after the latest cycle start
+    latest_cycle_start = max(cycle[0] for cycle in cycles)
+    # Before that, the ghost with the latest cycle start has to be on one of
+    # its pre-cycle Z nodes
+    latest_cycle = max(cycles, key=lambda cycle: cycle[0])
+    for step in latest_cycle[2]:
+        if step > 0 and all(_is_z_step(cycle, step) for cycle in cycles):
+            return step
+    # After that, every ghost has to be on one of the Z nodes in its cycle
+    best = None
+    for z_steps in it.product(*[cycle[3] for cycle in cycles]):
+        congruence = (0, 1)
+        for step, cycle in zip(z_steps, cycles):
+            congruence = _combine_congruences(*congruence, step, cycle[1])
+            if congruence is None:
+                break
+        else:
+            remainder, modulus = congruence
+            # Find the first step that satisfies this after all the cycles
+            # have started
+            step = remainder
+            if step < max(latest_cycle_start, 1):
+                step += math.ceil((max(latest_cycle_start, 1) - step)
+                                  / modulus) * modulus
+            if best is None or step < best:
+                best = step
+    return best
+
+def compile_network(maze):
+    """Compile the maze into integer node IDs
+
+    This function takes in the maze dict (see navigate()) and gives each node
+    an integer ID. It returns a tuple of the list of node names (indexed by
+    ID), a dict mapping node names to IDs, and two NumPy arrays giving the ID
+    of the node reached by turning left and right from each node.
+    """
+    names = list(maze)
+    ids = {name: i for i, name in enumerate(names)}
+    left = np.array([ids[maze[name][0]] for name in names], dtype=np.int64)
+    right = np.array([ids[maze[name][1]] for name in names], dtype=np.int64)
+    return names, ids, left, right
+
+def build_jump_tables(directions, left, right, targets, max_power=64):
+    """Build the tables used to jump through the maze
+
+    This function takes in the list of directions, the left and right arrays
+    from compile_network(), and a boolean array marking the target nodes (for
+    example, the ones ending in Z). It returns a dict of NumPy arrays:
+    - 'prefix': row r gives the node reached after the first r directions from
+      each node (so the last row is the node reached after a full pass)
+    - 'first_target': the first step (1 to len(directions)) within a pass from
+      each node at which a target node is reached, or -1 if there isn't one
+    - 'jumps': row k gives the node reached after 2**k full passes from each
+      node
+    - 'any_target': row k tells whether a target node is reached anywhere in
+      the 2**k full passes from each node
+    """
+    num_nodes = len(left)
+    prefix = np.empty((len(directions) + 1, num_nodes), dtype=np.int64)
+    prefix[0] = np.arange(num_nodes)
+    for r, direction in enumerate(directions):
+        prefix[r + 1] = (right if direction else left)[prefix[r]]
+    # Find the first step in a pass that lands on a target
+    hits = targets[prefix[1:]]
+    first_target = np.where(hits.any(axis=0), hits.argmax(axis=0) + 1, -1)
+    # Now double the number of passes at every level
+    jumps = [prefix[-1]]
+    any_target = [first_target >= 0]
+    for _ in range(max_power - 1):
+        jumps.append(jumps[-1][jumps[-1]])
+        any_target.append(any_target[-1] | any_target[-1][jumps[-2]])
+    return {
+            'prefix': prefix,
+            'first_target': first_target,
+            'jumps': np.array(jumps),
+            'any_target': np.array(any_target),
+            }
+
+def node_after_steps(tables, node, num_steps):
+    """Return the node reached after a number of steps
+
+    This function takes in the tables from build_jump_tables(), the ID of the
+    starting node and the number of steps to take. The full passes through the
+    directions are taken by combining the power of two jumps that make up
+    their number and the rest are looked up in the prefix table, so this takes
+    O(log(num_steps)) time.
+    """
+    num_passes, remainder = divmod(num_steps, tables['prefix'].shape[0] - 1)
+    if num_passes >> len(tables['jumps']):
+        raise ValueError(f'Too many steps: {num_steps}')
+    power = 0
+    while num_passes:
+        if num_passes & 1:
+            node = tables['jumps'][power][node]
+        num_passes >>= 1
+        power += 1
+    return int(tables['prefix'][remainder][node])
+
+def steps_to_target(tables, node):
+    """Return the number of steps until a target node is reached
+
+    This function takes in the tables from build_jump_tables() and the ID of
+    the starting node. It returns the number of steps (at least 1) it takes to
+    first reach a target node, or None if no target is reached within the
+    2**max_power passes the tables cover. It takes O(max_power) time.
+    """
+    if not tables['any_target'][-1][node]:
+        return None
+    # Take the biggest jumps that don't reach a target
+    num_passes = 0
+    for power in reversed(range(len(tables['jumps']))):
+        if not tables['any_target'][power][node]:
+            node = tables['jumps'][power][node]
+            num_passes += 1 << power
+    # The target is now reached within the next pass
+    pass_length = tables['prefix'].shape[0] - 1
+    return num_passes * pass_length + int(tables['first_target'][node])
+
+def navigate_compiled(directions, maze):
+    """Navigate through the maze using the compiled network
+
+    This function does the same thing as navigate() but compiles the maze (see
+    compile_network()) and uses the jump tables (see build_jump_tables()) to
+    find the number of steps from AAA to ZZZ.
+    """
+    names, ids, left, right = compile_network(maze)
+    targets = np.array([name == 'ZZZ' for name in names])
+    tables = build_jump_tables(directions, left, right, targets)
+    return steps_to_target(tables, ids['AAA'])
+
 def parse_data(data):
     """Parse the data to make it usable"""
     directions = None
@@ -71,6 +286,8 @@ def main(filename):
     directions, mapping = parse_data(data)
     num_steps = navigate(directions, mapping)
     print(f'Number of steps to reach destination: {num_steps}')
+    num_steps = navigate_ghosts(directions, mapping)
+    print(f'Number of steps for ghosts to reach destinations: {num_steps}')
     return directions, mapping
 
 if __name__ == "__main__":
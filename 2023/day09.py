@@ -1,5 +1,6 @@
 """Day 09: Mirage Maintenance"""
 
+import math
 import sys
 
 import numpy as np
@@ -83,9 +84,56 @@ def sum_extrapolated_values(sequences, reverse=False):
     all the extrapolated values.
     """
     if not reverse:
-        return sum([find_next_element(seq) for seq in sequences])
+        return sum([int(find_next_element(seq)) for seq in sequences])
     else:
-        return sum([find_prev_element(seq) for seq in sequences])
+        return sum([int(find_prev_element(seq)) for seq in sequences])
+
+def extrapolation_weights(length, reverse=False):
+    """Return the weights that extrapolate a sequence of a given length
+
+    Taking differences until they are constant and building back up (see
+    find_next_element()) is the same as fitting the polynomial that goes
+    through all the values of the sequence and evaluating it one step past the
+    end. Using Newton's forward differences, this works out to be a weighted
+    sum of the values of the sequence with binomial coefficients as weights:
+    - next element: sum over k of (-1)**(n-1-k) * C(n, k) * a[k]
+    - previous element: sum over k of (-1)**k * C(n, k+1) * a[k]
+    where n is the length of the sequence. This function returns these weights
+    as a list of Python integers.
+    """
+    n = length
+    if not reverse:
+        return [(-1) ** (n - 1 - k) * math.comb(n, k) for k in range(n)]
+    return [(-1) ** k * math.comb(n, k + 1) for k in range(n)]
+
+def extrapolate_all(sequences, reverse=False):
+    """Return the extrapolated values for all the sequences at once
+
+    This function takes in a list of sequences that all have the same length
+    and loads them into one 2D array. The next (or previous) element of every
+    sequence is then a single matrix-vector product with the weights from
+    extrapolation_weights(). If the product could overflow 64 bit integers, it
+    is done with Python integers instead so the result is always exact. It
+    returns a NumPy array with one extrapolated value per sequence.
+    """
+    matrix = np.array(sequences, dtype=np.int64)
+    if matrix.ndim != 2:
+        raise ValueError('All the sequences must have the same length')
+    weights = extrapolation_weights(matrix.shape[1], reverse=reverse)
+    # Check how big the result could get
+    largest_value = int(np.abs(matrix).max()) if matrix.size else 0
+    bound = largest_value * sum(abs(w) for w in weights)
+    if bound < np.iinfo(np.int64).max:
+        return matrix @ np.array(weights, dtype=np.int64)
+    return matrix.astype(object) @ np.array(weights, dtype=object)
+
+def sum_extrapolated_values_vectorized(sequences, reverse=False):
+    """Compute the sum of the extrapolated values
+
+    This function does the same thing as sum_extrapolated_values() but uses
+    extrapolate_all() to extrapolate all the sequences at once.
+    """
+    return int(extrapolate_all(sequences, reverse=reverse).sum(dtype=object))
 
 def parse_data(data):
     """Parse the data to make it usable"""
@@ -104,9 +152,9 @@ def read_data(filename):
 def main(filename):
     data = read_data(filename)
     sequences = parse_data(data)
-    target_value = sum_extrapolated_values(sequences, reverse=False)
+    target_value = sum_extrapolated_values_vectorized(sequences, reverse=False)
     print(f'Sum of all extrapolated values: {target_value}')
-    target_value = sum_extrapolated_values(sequences, reverse=True)
+    target_value = sum_extrapolated_values_vectorized(sequences, reverse=True)
     print(f'Sum of all extrapolated values: {target_value}')
     return sequences
 
@@ -1,6 +1,7 @@
 """Day 10: Pipe Maze"""
 
 import sys
+import numpy as np
 
 PIPES = {
         '|': ('N', 'S'),
@@ -12,6 +13,34 @@ PIPES = {
         '.': ('.', '.'),
         }
 
+# The directions in the order they are numbered when the maze is compiled
+DIRECTIONS = ('N', 'E', 'S', 'W')
+OPPOSITE_DIRECTIONS = {'N': 'S', 'S': 'N', 'E': 'W', 'W': 'E'}
+# The number each pipe is stored as when the maze is compiled
+PIPE_CODES = {pipe: code for code, pipe in enumerate(PIPES)}
+
+def _build_transition_table():
+    """Return the table of exit directions for each pipe and direction
+
+    This function returns a flat list where the entry at index
+    4 * pipe code + direction number is the direction number we leave the pipe
+    in if we were moving in that direction when we entered it. If the pipe
+    can't be entered while moving in that direction, the entry is -1.
+    """
+    table = [-1] * (4 * len(PIPES))
+    for pipe, openings in PIPES.items():
+        for moving_direction in DIRECTIONS:
+            entrance = OPPOSITE_DIRECTIONS[moving_direction]
+            if entrance not in openings:
+                continue
+            # The other opening is the exit
+            exit_direction = openings[1] if openings[0] == entrance else openings[0]
+            index = 4 * PIPE_CODES[pipe] + DIRECTIONS.index(moving_direction)
+            table[index] = DIRECTIONS.index(exit_direction)
+    return table
+
+TRANSITIONS = _build_transition_table()
+
 def advance(maze, point, direction):
     """Get the next point and direction in the maze
 
@@ -49,6 +78,42 @@ def advance(maze, point, direction):
     next_direction = pipe_direction
     return next_point, next_direction
 
+def make_loop_mask(maze, loop):
+    """Return a mask of the points on the loop
+
+    This function accepts the maze as a list of strings, and the loop as a list
+    of points. It returns a 2D boolean NumPy array the size of the maze that is
+    True for the points on the loop, so that checking if a point is on the loop
+    doesn't need to search through the whole loop.
+    """
+    mask = np.zeros((len(maze), len(maze[0])), dtype=bool)
+    if loop:
+        rows, columns = zip(*loop)
+        mask[list(rows), list(columns)] = True
+    return mask
+
+def find_enclosed_area_shoelace(loop):
+    """Find the area enclosed by the loop using the shoelace formula
+
+    This function accepts the loop as a list of points in the order they are
+    visited (like the one returned by find_furthest_point()). It then returns
+    the number of points inside the loop as an integer. It does not need to
+    look at the maze at all.
+
+    The shoelace formula gives the area A of the polygon whose vertices are the
+    points of the loop. Since all the points are on the integer grid, Pick's
+    theorem says that A = I + B/2 - 1, where I is the number of points inside
+    the loop and B is the number of points on the loop. So I = A - B/2 + 1.
+    """
+    points = np.asarray(loop, dtype=np.int64)
+    rows = points[:, 0]
+    columns = points[:, 1]
+    next_rows = np.roll(rows, -1)
+    next_columns = np.roll(columns, -1)
+    # This is twice the area (the sign depends on the direction of the loop)
+    twice_area = abs(int((rows * next_columns - next_rows * columns).sum()))
+    return (twice_area - len(loop)) // 2 + 1
+
 def find_enclosed_area(maze, loop):
     """Find the area enclosed by the loop
 
@@ -56,6 +121,8 @@ def find_enclosed_area(maze, loop):
     of points. It then returns the number of points inside the loop as an
     integer.
     """
+    # Mark the points on the loop once so that checking them is quick
+    on_loop = make_loop_mask(maze, loop)
     # To do this, we just loop over all the points in the maze
     # The parity (whether a point is inside or outside) changes based on the
     # following rules. Only points on the loop can cause a change in parity.
@@ -77,7 +144,7 @@ def find_enclosed_area(maze, loop):
     prev_turn = None  # To store the last loop turn
     for i, line in enumerate(maze):
         for j, point in enumerate(line):
-            if (i, j) not in loop:
+            if not on_loop[i, j]:
                 # Parity does not change
                 area += parity
             elif point == '|':
@@ -149,6 +216,83 @@ def find_furthest_point(maze, starting_location, connected_pipes, return_loop=Fa
     else:
         return point1, num_steps
 
+def compile_maze(maze):
+    """Compile the maze into a flat list of pipe codes
+
+    This function accepts the maze as a list of strings and returns a tuple of
+    the pipe codes (see PIPE_CODES) of all the points in the maze, row after
+    row, in a flat list along with the width of the compiled maze. Any
+    character that isn't a pipe is treated like ground ('.').
+
+    The maze is surrounded by a border of ground one point wide so that
+    walking off any edge lands on ground instead of wrapping around to another
+    row. So the compiled width is 2 more than the width of the maze and the
+    point (i, j) is at index (i + 1) * width + (j + 1).
+    """
+    width = max(len(line) for line in maze) + 2
+    ground = PIPE_CODES['.']
+    cells = [ground] * width
+    for line in maze:
+        cells.append(ground)
+        cells.extend(PIPE_CODES.get(char, ground) for char in line)
+        # Pad short lines out to the full width
+        cells.extend([ground] * (width - 1 - len(line)))
+    cells.extend([ground] * width)
+    return cells, width
+
+def trace_loop(maze, starting_location, direction):
+    """Return the points along the loop
+
+    This function accepts the maze as a list of strings, the starting location,
+    and the direction of one of the pipes connecting to the starting location.
+    It follows the loop in that direction until it gets back to the starting
+    location and returns the list of points visited (starting with the
+    starting location) in order.
+
+    Instead of working with strings, the maze is compiled into a flat list of
+    pipe codes (see compile_maze()), so each step is just a lookup in the
+    TRANSITIONS table and an addition to the flat index.
+    """
+    cells, width = compile_maze(maze)
+
+    def to_point(position):
+        """Convert a flat index back to a point in the maze"""
+        row, column = divmod(position, width)
+        return row - 1, column - 1
+
+    # How much the flat index changes when moving in each direction
+    step_sizes = [-width, 1, width, -1]
+    transitions = TRANSITIONS
+    start = (starting_location[0] + 1) * width + starting_location[1] + 1
+    position = start
+    direction = DIRECTIONS.index(direction)
+    flat_loop = [start]
+    while True:
+        position += step_sizes[direction]
+        if position == start:
+            break
+        flat_loop.append(position)
+        direction = transitions[4 * cells[position] + direction]
+        if direction < 0:
+            raise ValueError(f'The loop is broken at point '
+                             f'{to_point(position)}')
+    return [to_point(position) for position in flat_loop]
+
+def find_furthest_point_table(maze, starting_location, connected_pipes,
+                              return_loop=False):
+    """Find the furthest point along the maze
+
+    This function does the same thing as find_furthest_point() but uses
+    trace_loop() to go around the whole loop once. The furthest point is then
+    halfway around the loop.
+    """
+    loop = trace_loop(maze, starting_location, connected_pipes[0])
+    num_steps = len(loop) // 2
+    furthest_point = loop[num_steps]
+    if return_loop:
+        return furthest_point, num_steps, loop
+    return furthest_point, num_steps
+
 def parse_data(data):
     """Parse the data to make it usable"""
     # I could store the maze as a list of lists with each entry pointing to the
@@ -203,18 +347,27 @@ def read_data(filename):
     data = data.splitlines()
     return data
 
-def main(filename):
+def main(filename, area_method='parity'):
     data = read_data(filename)
     starting_location, connected_pipes, data = parse_data(data)
-    furthest_point, num_steps, loop = find_furthest_point(data,
-                                                          starting_location,
-                                                          connected_pipes,
-                                                          return_loop=True)
+    furthest_point, num_steps, loop = find_furthest_point_table(
+            data,
+            starting_location,
+            connected_pipes,
+            return_loop=True,
+            )
     print(f'Number of steps to furthest point: {num_steps}')
-    area = find_enclosed_area(data, loop)
+    match area_method:
+        case 'parity':
+            area = find_enclosed_area(data, loop)
+        case 'shoelace':
+            area = find_enclosed_area_shoelace(loop)
+        case default:
+            raise ValueError(f'Unknown area method "{area_method}"')
     print(f'Enclosed area: {area}')
     return data, starting_location, connected_pipes
 
 if __name__ == "__main__":
     filename = sys.argv[1]
-    data, start_location, connected_pipes = main(filename)
+    area_method = sys.argv[2] if len(sys.argv) > 2 else 'parity'
+    data, start_location, connected_pipes = main(filename, area_method)
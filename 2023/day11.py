@@ -1,6 +1,18 @@
 """Day 11: Cosmic Expansion"""
 
 import sys
+import numpy as np
+
+def _total_pairwise_differences(values):
+    """Return the sum of the absolute differences between all pairs of values
+
+    This function sorts the values so that each difference is just the later
+    value minus the earlier one. Going through the sorted values, each value
+    is then added once for every value before it and subtracted once for every
+    value after it (which is what a running prefix sum would give).
+    """
+    n = len(values)
+    return sum(value * (2 * i - n + 1) for i, value in enumerate(sorted(values)))
 
 def compute_total_pairwise_distances(galaxy_locations):
     """Return the total intergalactic distances
@@ -8,12 +20,59 @@ def compute_total_pairwise_distances(galaxy_locations):
     This function accepts the locations of the galaxies and computes the
     shortests pairwise distances. It then returns the sum of all the computed
     distances.
+
+    Since the distances are Manhattan distances, the rows and columns can be
+    handled separately. Each of them is sorted and summed up in O(n log n)
+    time (see _total_pairwise_differences()) without ever computing the
+    individual distances.
+    """
+    if not galaxy_locations:
+        return 0
+    rows, columns = zip(*galaxy_locations)
+    return (_total_pairwise_differences(rows)
+            + _total_pairwise_differences(columns))
+
+def count_empty_lines_before(galaxy_locations, num_rows, num_cols):
+    """Return how many empty rows and columns come before each row and column
+
+    This function accepts the locations of the galaxies and the size of the
+    image. It returns two NumPy arrays: the first has, for each row number, the
+    number of rows before it that don't have any galaxies, and the second has
+    the same for the columns. These only need to be computed once no matter
+    how many different expansion factors are used.
     """
-    distances = []
-    for i, (g1x, g1y) in enumerate(galaxy_locations):
-        for (g2x, g2y) in galaxy_locations[i+1:]:
-            distances.append(abs(g1x-g2x) + abs(g1y-g2y))
-    return sum(distances)
+    galaxy_locations = np.asarray(galaxy_locations, dtype=np.int64)
+    galaxy_locations = galaxy_locations.reshape((-1, 2))
+    empty_rows = np.ones(num_rows, dtype=np.int64)
+    empty_columns = np.ones(num_cols, dtype=np.int64)
+    empty_rows[galaxy_locations[:, 0]] = 0
+    empty_columns[galaxy_locations[:, 1]] = 0
+    # Shift the running totals by one so that a row or column doesn't count
+    # itself
+    empty_rows_before = np.concatenate(([0], np.cumsum(empty_rows)[:-1]))
+    empty_columns_before = np.concatenate(([0], np.cumsum(empty_columns)[:-1]))
+    return empty_rows_before, empty_columns_before
+
+def expand_galaxy_locations_multi(galaxy_locations, num_rows, num_cols,
+                                  factors):
+    """Return expanded galactic locations for several factors at once
+
+    This function does the same thing as expand_galaxy_locations() but for a
+    list of factors. Each galaxy moves by (factor - 1) times the number of
+    empty rows and columns before it, so the new locations are an affine
+    function of the factor and can all be computed at once. It returns a NumPy
+    array with one (number of galaxies x 2) array of locations per factor.
+    """
+    empty_rows_before, empty_columns_before = count_empty_lines_before(
+            galaxy_locations, num_rows, num_cols)
+    galaxy_locations = np.asarray(galaxy_locations, dtype=np.int64)
+    galaxy_locations = galaxy_locations.reshape((-1, 2))
+    shifts = np.stack((
+        empty_rows_before[galaxy_locations[:, 0]],
+        empty_columns_before[galaxy_locations[:, 1]],
+        ), axis=1)
+    growth = np.asarray(factors, dtype=np.int64) - 1
+    return galaxy_locations + growth[:, None, None] * shifts
 
 def expand_galaxy_locations(galaxy_locations, num_rows, num_cols, factor):
     """Return expanded galactic locations
@@ -23,29 +82,38 @@ def expand_galaxy_locations(galaxy_locations, num_rows, num_cols, factor):
     factor by which to expand the galaxy, i.e., how many rows and columns to
     replace each empty row and column by.
     """
-    # First find the rows and columns that don't have galaxies
-    # These can be identified as the row and column numbers that do not appear
-    # in any of the galaxy locations
-    rows_without_galaxies = list(range(num_rows))
-    columns_without_galaxies = list(range(num_cols))
-    galaxy_rows, galaxy_columns = zip(*galaxy_locations)
-    # Remove all the galaxy rows and columns now
-    for row in set(galaxy_rows):
-        rows_without_galaxies.remove(row)
-    for column in set(galaxy_columns):
-        columns_without_galaxies.remove(column)
-    # Now when we expand these rows and columns, we can compute the new
-    # galactic locations
-    # In this case, we find how many rows and columns come "before" this galaxy
-    # in the universe. Each of those needs to get expanded so the galaxy shifts
-    # by one unit in each direction per additional row and column added
-    new_locations = []
-    for row, column in galaxy_locations:
-        # Figure out how many rows and columns appear before it
-        add_rows = len([r for r in rows_without_galaxies if r < row])
-        add_columns = len([c for c in columns_without_galaxies if c < column])
-        new_locations.append((row + add_rows * (factor - 1), column + add_columns * (factor - 1)))
-    return new_locations
+    # Each galaxy shifts by one unit in each direction per additional row and
+    # column added before it (see expand_galaxy_locations_multi())
+    new_locations = expand_galaxy_locations_multi(
+            galaxy_locations, num_rows, num_cols, [factor])[0]
+    return [(row, column) for row, column in new_locations.tolist()]
+
+def compute_total_distances_for_factors(galaxy_locations, num_rows, num_cols,
+                                        factors):
+    """Return the total intergalactic distances for several expansion factors
+
+    This function accepts the locations of the galaxies, the size of the image,
+    and a list of expansion factors. It returns a list with the total pairwise
+    distance after expanding by each factor.
+
+    The number of empty rows (or columns) before a galaxy never decreases as
+    the row (or column) increases. So, for any pair of galaxies, the distance
+    after expansion is the original distance plus (factor - 1) times the number
+    of empty rows and columns between them. Summing over all pairs, the total
+    is a + (factor - 1) * b, where a is the total distance before expansion and
+    b is the total distance measured in empty rows and columns. Both of these
+    only need to be computed once.
+    """
+    if not galaxy_locations:
+        return [0] * len(factors)
+    empty_rows_before, empty_columns_before = count_empty_lines_before(
+            galaxy_locations, num_rows, num_cols)
+    rows, columns = zip(*galaxy_locations)
+    a = compute_total_pairwise_distances(galaxy_locations)
+    b = (_total_pairwise_differences(empty_rows_before[list(rows)].tolist())
+         + _total_pairwise_differences(
+             empty_columns_before[list(columns)].tolist()))
+    return [a + (factor - 1) * b for factor in factors]
 
 def locate_galaxies(image):
     """Return a list of locations of the galaxies
@@ -71,14 +139,14 @@ def main(filename):
     image = read_data(filename)
     galaxy_locations = locate_galaxies(image)
     print('The following table shows the pairwise distances:')
-    for factor in (2, 10, 100, 1000000):
-        galaxy_locations_new = expand_galaxy_locations(
-                locate_galaxies(image),
-                num_rows=len(image),
-                num_cols=len(image[0]),
-                factor=factor,
-                )
-        total_distance = compute_total_pairwise_distances(galaxy_locations_new)
+    factors = (2, 10, 100, 1000000)
+    total_distances = compute_total_distances_for_factors(
+            galaxy_locations,
+            num_rows=len(image),
+            num_cols=len(image[0]),
+            factors=factors,
+            )
+    for factor, total_distance in zip(factors, total_distances):
         print(f'After expansion by a factor of {factor}: {total_distance}')
     return image
 
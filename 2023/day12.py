@@ -1,23 +1,87 @@
 """Day 12: Hot Springs"""
 
-import functools
 import itertools as it
+import multiprocessing
 import re
 import sys
+import time
+
+# The most entries the cache used by count_permutations_string_based() can
+# hold for a single record (None for no limit)
+STRING_CACHE_MAXSIZE = 100000
+# Counters for the cache used by count_permutations_string_based()
+# These are reset at the start of every record_permutations() call and, after
+# it, hold the totals across all the records it counted (including the ones
+# counted in worker processes)
+STRING_CACHE_STATS = {'hits': 0, 'misses': 0, 'evictions': 0, 'max_size': 0}
+
+def string_cache_info():
+    """Return the statistics of the string based method's cache
+
+    This function returns a dict with the number of cache hits, misses, and
+    evictions so far along with the largest size the cache has grown to for a
+    single record.
+    """
+    return dict(STRING_CACHE_STATS)
+
+def reset_string_cache_stats():
+    """Set all the counters of the string based method's cache back to 0"""
+    STRING_CACHE_STATS.update(hits=0, misses=0, evictions=0, max_size=0)
 
-@functools.cache
 def count_permutations_string_based(sequence, damage_counts):
     """Count the permutations for a sequence
 
     This function takes in a sequence string and the counts of damaged springs
     in the sequence as a tuple. It then returns the number of arrangements of
     damaged springs that are possible.
+
+    The work is done by _count_permutations_from(), which is memoized on the
+    (offset, group index) it starts from instead of the remaining string and
+    counts. The cache is made fresh for each record so that it never holds more
+    than one record's worth of small integer keys.
+    """
+    cache = {}
+    counts = _count_permutations_from(sequence, damage_counts, 0, 0, cache)
+    STRING_CACHE_STATS['max_size'] = max(STRING_CACHE_STATS['max_size'],
+                                         len(cache))
+    return counts
+
+def _count_permutations_from(sequence, damage_counts, offset, group, cache):
+    """Count the permutations for the rest of a sequence
+
+    This function returns the number of arrangements of damaged springs that
+    are possible in sequence[offset:] given that the groups before
+    damage_counts[group] have already been placed. Results are stored in
+    cache, keyed on (offset, group), which holds at most STRING_CACHE_MAXSIZE
+    entries (the oldest entries are dropped first).
+    """
+    key = (offset, group)
+    if key in cache:
+        STRING_CACHE_STATS['hits'] += 1
+        return cache[key]
+    STRING_CACHE_STATS['misses'] += 1
+    counts = _count_permutations_uncached(sequence, damage_counts, offset,
+                                          group, cache)
+    if STRING_CACHE_MAXSIZE is not None and len(cache) >= STRING_CACHE_MAXSIZE:
+        # Drop the oldest entry to make room
+        del cache[next(iter(cache))]
+        STRING_CACHE_STATS['evictions'] += 1
+    cache[key] = counts
+    return counts
+
+def _count_permutations_uncached(sequence, damage_counts, offset, group,
+                                 cache):
+    """Count the permutations for the rest of a sequence without the cache
+
+    This function does the actual work for _count_permutations_from(). Any
+    recursive calls go back through _count_permutations_from() so that they
+    are cached.
     """
     counts = 0
-    i = 0
+    i = offset
     while i < len(sequence):
         # Get the count of damaged springs in the current group
-        group_target = damage_counts[0]
+        group_target = damage_counts[group]
         # Start a count of how many we've seen in the current group
         current_group = 0
         current_group_start = -1
@@ -70,7 +134,7 @@ def count_permutations_string_based(sequence, damage_counts):
                         continue  # this resets everything else
                     # If we've made it here then things seem to have worked so
                     # far
-                    if len(damage_counts) == 1:
+                    if group == len(damage_counts) - 1:
                         # This was the last group we needed to satisfy and
                         # we've made it to the end
                         # Now we just need to make sure that there are no more
@@ -91,9 +155,12 @@ def count_permutations_string_based(sequence, damage_counts):
                     else:
                         # Now we can recursively compute arrangements for the rest
                         # of the sequence
-                        counts += count_permutations(
-                                sequence[i+1:],
-                                damage_counts[1:],
+                        counts += _count_permutations_from(
+                                sequence,
+                                damage_counts,
+                                i + 1,
+                                group + 1,
+                                cache,
                                 )
                         # Once we get to this point, we can go back to the start of
                         # the group and go down the other path - assume that it was
@@ -125,7 +192,7 @@ def count_permutations_string_based(sequence, damage_counts):
             if i < len(sequence) and sequence[i] == '#':
                 # We've failed again: this arrangement does not work
                 return counts
-            if len(damage_counts) == 1:
+            if group == len(damage_counts) - 1:
                 # This was the last group we needed to satisfy and we've
                 # made it to the end
                 # Now we just need to make sure that there are no more
@@ -143,9 +210,12 @@ def count_permutations_string_based(sequence, damage_counts):
             else:
                 # Now we can recursively compute arrangements for the rest
                 # of the sequence
-                counts += count_permutations(
-                        sequence[i+1:],
-                        damage_counts[1:],
+                counts += _count_permutations_from(
+                        sequence,
+                        damage_counts,
+                        i + 1,
+                        group + 1,
+                        cache,
                         )
                 # Once we get to this point, we can't go back to the start of
                 # the group and assume that the operational spring we started
@@ -216,7 +286,122 @@ def count_permutations_binary_based(sequence, damage_counts):
             counts += 1
     return counts
 
-def total_permutations(sequences, damage_counts, folds=1):
+def count_permutations_dp_based(sequence, damage_counts):
+    """Count the permutations for a sequence
+
+    This function takes in a sequence string and the counts of damaged springs
+    in the sequence as a tuple. It then returns the number of arrangements of
+    damaged springs that are possible.
+
+    It uses dynamic programming instead of enumerating arrangements. The state
+    after each character is described by the index of the group being filled
+    and the length of the run of damaged springs in that group so far. For each
+    state, only the number of ways to reach it is stored. The cost is,
+    therefore, proportional to the length of the sequence times the number of
+    states, which stays small even when the records are folded many times.
+    """
+    # Encode the sequence once as which characters could be damaged and which
+    # could be operational springs (a ? could be either)
+    can_be_damaged = [c != '.' for c in sequence]
+    can_be_operational = [c != '#' for c in sequence]
+    num_groups = len(damage_counts)
+    # Map each (group index, run length) state to the number of ways to get to
+    # that state
+    # Before the first character, we haven't started any groups
+    states = {(0, 0): 1}
+    for damaged, operational in zip(can_be_damaged, can_be_operational):
+        new_states = {}
+        for (group, run), ways in states.items():
+            if damaged and group < num_groups and run < damage_counts[group]:
+                # Extend the current group by one damaged spring
+                new_state = (group, run + 1)
+                new_states[new_state] = new_states.get(new_state, 0) + ways
+            if operational:
+                if run == 0:
+                    # We're in between groups so nothing changes
+                    new_state = (group, 0)
+                elif run == damage_counts[group]:
+                    # This operational spring closes off a full group
+                    new_state = (group + 1, 0)
+                else:
+                    # The group was closed off before it was full
+                    continue
+                new_states[new_state] = new_states.get(new_state, 0) + ways
+        states = new_states
+    # The arrangement is valid if all the groups are done, including if the
+    # sequence ended right as the last group was filled up
+    counts = states.get((num_groups, 0), 0)
+    if num_groups:
+        counts += states.get((num_groups - 1, damage_counts[-1]), 0)
+    return counts
+
+# The different methods that can be used to count the permutations
+METHODS = {
+        'binary': count_permutations_binary_based,
+        'string': count_permutations_string_based,
+        'dp': count_permutations_dp_based,
+        }
+
+def _count_chunk(method, records):
+    """Count the permutations for a chunk of records
+
+    This function accepts the name of the counting method (see METHODS) and a
+    list of (sequence, damage counts) records that have already been unfolded.
+    It returns a list of (number of permutations, seconds taken) tuples, one
+    for each record, along with the cache statistics for this chunk (see
+    string_cache_info()). It is a separate function so that it can be sent to
+    the worker processes.
+    """
+    count_permutations = METHODS[method]
+    reset_string_cache_stats()
+    results = []
+    for sequence, counts in records:
+        start_time = time.perf_counter()
+        num_permutations = count_permutations(sequence, counts)
+        results.append((num_permutations, time.perf_counter() - start_time))
+    return results, string_cache_info()
+
+def record_permutations(sequences, damage_counts, folds=1, method='string',
+                        workers=1, chunksize=16):
+    """Return the permutations and timing for each record
+
+    This function accepts the sequences and corresponding damage counts and
+    computes the number of possible arrangements for each record using the
+    chosen method (see METHODS). It returns a list of (number of permutations,
+    seconds taken) tuples in the same order as the records.
+
+    The records are split into chunks of chunksize records. If workers is more
+    than 1, the chunks are handed out to a pool of that many processes.
+    Otherwise, they are all counted in this process. Either way, the results
+    come back in the same order so the totals are always the same.
+
+    The cache statistics from every chunk are added up into
+    STRING_CACHE_STATS so that string_cache_info() covers all the records
+    counted in this call no matter which process counted them.
+    """
+    if method not in METHODS:
+        raise ValueError(f'Unknown method "{method}"')
+    # Unfold all the records first
+    records = [('?'.join([sequence] * folds), counts * folds)
+               for sequence, counts in zip(sequences, damage_counts)]
+    chunks = [(method, records[i:i+chunksize])
+              for i in range(0, len(records), chunksize)]
+    if workers > 1:
+        with multiprocessing.Pool(workers) as pool:
+            chunk_results = pool.starmap(_count_chunk, chunks)
+    else:
+        chunk_results = list(it.starmap(_count_chunk, chunks))
+    # Combine the cache statistics from all the chunks
+    reset_string_cache_stats()
+    for _, stats in chunk_results:
+        for name in ('hits', 'misses', 'evictions'):
+            STRING_CACHE_STATS[name] += stats[name]
+        STRING_CACHE_STATS['max_size'] = max(STRING_CACHE_STATS['max_size'],
+                                             stats['max_size'])
+    return [result for results, _ in chunk_results for result in results]
+
+def total_permutations(sequences, damage_counts, folds=1, method='string',
+                       workers=1, chunksize=16):
     """Return the total permutations for all records
 
     This function accepts the sequences and corresponding damage counts. It
@@ -224,14 +409,28 @@ def total_permutations(sequences, damage_counts, folds=1):
     returns the total number of arrangements across all the different records.
 
     This function also accepts an optional folds parameter that signifies how
-    many times the records are folded over.
+    many times the records are folded over. The method, workers and chunksize
+    parameters are passed on to record_permutations().
+    """
+    results = record_permutations(sequences, damage_counts, folds=folds,
+                                  method=method, workers=workers,
+                                  chunksize=chunksize)
+    return sum(num_permutations for num_permutations, _ in results)
+
+def print_slowest_records(sequences, damage_counts, results, num_records=5):
+    """Print the records that took the longest to count
+
+    This function accepts the sequences, damage counts, and the results from
+    record_permutations() and prints the num_records slowest records along
+    with the time they took.
     """
-    num_permutations = 0
-    for sequence, counts in zip(sequences, damage_counts):
-        sequence = '?'.join([sequence] * folds)
-        counts = counts * folds
-        num_permutations += count_permutations(sequence, counts)
-    return num_permutations
+    slowest = sorted(range(len(results)),
+                     key=lambda i: results[i][1],
+                     reverse=True)
+    for i in slowest[:num_records]:
+        counts = ','.join(str(n) for n in damage_counts[i])
+        print(f'  Record {i} ({sequences[i]} {counts}): '
+              f'{results[i][1]:.4f} s')
 
 def parse_data(data):
     """Parse the data to make it usable"""
@@ -250,23 +449,24 @@ def read_data(filename):
     data = data.splitlines()
     return data
 
-def main(filename):
+def main(filename, method='string', workers=1):
     data = read_data(filename)
     sequences, damage_counts = parse_data(data)
-    num_permutations = total_permutations(sequences, damage_counts, folds=1)
+    num_permutations = total_permutations(sequences, damage_counts, folds=1,
+                                          method=method, workers=workers)
     print(f'Total number of permutations with 1 fold: {num_permutations}')
-    num_permutations = total_permutations(sequences, damage_counts, folds=5)
+    results = record_permutations(sequences, damage_counts, folds=5,
+                                  method=method, workers=workers)
+    num_permutations = sum(num_permutations for num_permutations, _ in results)
     print(f'Total number of permutations with 5 folds: {num_permutations}')
+    print('Slowest records with 5 folds:')
+    print_slowest_records(sequences, damage_counts, results)
     return sequences, damage_counts
 
 if __name__ == "__main__":
     filename = sys.argv[1]
     method = sys.argv[2]
-    match method:
-        case 'binary':
-            count_permutations = count_permutations_binary_based
-        case 'string':
-            count_permutations = count_permutations_string_based
-        case default:
-            raise ValueError(f'Unknown method "{method}"')
-    sequences, damage_counts = main(filename)
+    if method not in METHODS:
+        raise ValueError(f'Unknown method "{method}"')
+    workers = int(sys.argv[3]) if len(sys.argv) > 3 else 1
+    sequences, damage_counts = main(filename, method=method, workers=workers)
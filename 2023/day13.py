@@ -64,6 +64,130 @@ def summarize(maps, num_smudges):
             summary_number += location
     return summary_number
 
+def encode_pattern(pattern):
+    """Encode a pattern as integer masks of its rows and columns
+
+    This function accepts a pattern of ash and rocks (as a np.chararray) and
+    returns a tuple of two lists of integers. The first has one integer per
+    row with a bit set for every rock in that row and the second has the same
+    for the columns. Comparing two rows (or columns) is then just an XOR of
+    their integers.
+    """
+    rocks = np.asarray(pattern == '#')
+    row_masks = [int(''.join('1' if rock else '0' for rock in row), 2)
+                 for row in rocks]
+    column_masks = [int(''.join('1' if rock else '0' for rock in column), 2)
+                    for column in rocks.T]
+    return row_masks, column_masks
+
+def find_mirror_in_masks(masks, num_smudges=0):
+    """Return the location of a mirror in a list of masks
+
+    This function does the same thing as find_horizontal_mirror() but accepts
+    the rows (or columns) of a pattern as integer masks (see encode_pattern()).
+    The number of differences between two rows is the number of bits set in
+    the XOR of their masks. A mirror is only returned if the rows reflected in
+    it have exactly num_smudges differences in total.
+    """
+    for location in range(1, len(masks)):
+        total_diffs = 0
+        # Compare the rows moving outwards from the mirror until one side runs
+        # out
+        for k in range(min(location, len(masks) - location)):
+            total_diffs += (masks[location - 1 - k]
+                            ^ masks[location + k]).bit_count()
+            if total_diffs > num_smudges:
+                break
+        if total_diffs == num_smudges:
+            return location
+    # No mirror found
+    return None
+
+def summarize_masks(encoded_maps, num_smudges):
+    """Return a summarized value of all the encoded maps
+
+    This function does the same thing as summarize() but accepts the maps
+    already encoded as row and column masks (see encode_pattern()), so they
+    can be reused for any number of smudges. Patterns without any mirror
+    don't add anything to the summary.
+    """
+    summary_number = 0
+    for row_masks, column_masks in encoded_maps:
+        if (location := find_mirror_in_masks(row_masks, num_smudges)):
+            summary_number += 100 * location
+        elif (location := find_mirror_in_masks(column_masks, num_smudges)):
+            summary_number += location
+    return summary_number
+
+def group_patterns_by_shape(maps):
+    """Pack the patterns into 3D arrays grouped by their shape
+
+    This function accepts a list of maps (as np.chararray's) and groups the
+    patterns that have the same shape together. It returns a dict mapping each
+    shape to a 3D boolean array of all the patterns with that shape (True where
+    there are rocks). Since all the patterns in a group have the same shape, no
+    padding is needed.
+    """
+    groups = {}
+    for pattern in maps:
+        groups.setdefault(pattern.shape, []).append(np.asarray(pattern == '#'))
+    return {shape: np.array(patterns) for shape, patterns in groups.items()}
+
+def count_mirror_differences(patterns):
+    """Count the differences across every possible horizontal mirror
+
+    This function accepts a 3D boolean array of patterns that all have the same
+    shape (see group_patterns_by_shape()). It returns a 2D array with one row
+    per pattern where the entry in column i is the total number of differences
+    between the rows reflected in a mirror after row i + 1. The number of
+    differences between every pair of rows in every pattern is computed at
+    once and then added up for each mirror location.
+    """
+    num_patterns, num_rows, _ = patterns.shape
+    # differences[p, i, j] is the number of differences between rows i and j
+    # of pattern p
+    differences = (patterns[:, :, None, :] != patterns[:, None, :, :]).sum(axis=3)
+    totals = np.zeros((num_patterns, num_rows - 1), dtype=np.int64)
+    for location in range(1, num_rows):
+        k = np.arange(min(location, num_rows - location))
+        totals[:, location - 1] = differences[:, location - 1 - k,
+                                              location + k].sum(axis=1)
+    return totals
+
+def _first_mirror_locations(totals, num_smudges):
+    """Return the first mirror location for each pattern
+
+    This function accepts the totals from count_mirror_differences() and
+    returns the first location of a mirror with exactly num_smudges
+    differences for each pattern (or 0 if there isn't one).
+    """
+    if not totals.shape[1]:
+        # The patterns only have one row so there's nowhere to put a mirror
+        return np.zeros(totals.shape[0], dtype=np.int64)
+    matches = totals == num_smudges
+    return np.where(matches.any(axis=1), matches.argmax(axis=1) + 1, 0)
+
+def summarize_batch(maps, smudge_values=(0, 1)):
+    """Return the summarized values of all the maps for several smudge values
+
+    This function does the same thing as summarize() but handles all the maps
+    with the same shape at once (see group_patterns_by_shape()) and works out
+    the summary for each number of smudges in smudge_values in the same pass.
+    It returns a dict mapping each number of smudges to the summary number.
+    Patterns without any mirror don't add anything to the summary.
+    """
+    summary_numbers = {num_smudges: 0 for num_smudges in smudge_values}
+    for patterns in group_patterns_by_shape(maps).values():
+        row_totals = count_mirror_differences(patterns)
+        # A vertical mirror is a horizontal mirror in the transpose
+        column_totals = count_mirror_differences(patterns.transpose(0, 2, 1))
+        for num_smudges in smudge_values:
+            rows = _first_mirror_locations(row_totals, num_smudges)
+            columns = _first_mirror_locations(column_totals, num_smudges)
+            summary_numbers[num_smudges] += int(
+                    np.where(rows > 0, 100 * rows, columns).sum())
+    return summary_numbers
+
 def parse_data(data):
     """Parse the data to make it usable"""
     # Convert the maps to np.chararray's so that it's easier to slice in each
@@ -92,9 +216,10 @@ def read_data(filename):
 def main(filename):
     data = read_data(filename)
     maps = parse_data(data)
-    summary_number = summarize(maps, num_smudges=0)
+    encoded_maps = [encode_pattern(pattern) for pattern in maps]
+    summary_number = summarize_masks(encoded_maps, num_smudges=0)
     print(f'Summary number with no smudges: {summary_number}')
-    summary_number = summarize(maps, num_smudges=1)
+    summary_number = summarize_masks(encoded_maps, num_smudges=1)
     print(f'Summary number with one smudge: {summary_number}')
     return maps
 
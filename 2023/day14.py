@@ -1,10 +1,110 @@
 """Day 14: Parabolic Reflector Dish"""
 
+from collections import OrderedDict
 import functools
 import sys
-from tqdm import tqdm
+import time
+import numpy as np
 
-@functools.cache
+# The values used to represent the platform as an array
+EMPTY = 0
+ROUND_ROCK = 1
+CUBE_ROCK = 2
+
+# The settings shared by all the caches created with bounded_cache()
+# - enabled: whether to use the caches at all
+# - maxsize: the most entries each cache can hold (None for no limit)
+# - maxbytes: the most (approximate) bytes each cache can hold (None for no
+#   limit)
+CACHE_SETTINGS = {'enabled': True, 'maxsize': 1024, 'maxbytes': None}
+# All the functions wrapped with bounded_cache() so they can be managed
+# together
+CACHED_FUNCTIONS = []
+
+def _approximate_size(value):
+    """Return the approximate number of bytes used by a value
+
+    This function accepts a string or a (possibly nested) tuple or list of
+    strings and returns the memory used by the value and everything in it.
+    """
+    if isinstance(value, (tuple, list)):
+        return sys.getsizeof(value) + sum(_approximate_size(v) for v in value)
+    return sys.getsizeof(value)
+
+def bounded_cache(function):
+    """Cache a function with a bounded least recently used cache
+
+    This decorator is used instead of functools.cache so that the memory used
+    by the cache doesn't keep growing with every new platform state. The cache
+    drops the least recently used entries once it holds more than
+    CACHE_SETTINGS['maxsize'] entries or CACHE_SETTINGS['maxbytes'] bytes. If
+    CACHE_SETTINGS['enabled'] is False, the function is just called directly.
+
+    The wrapped function gets a cache_info() function that returns a dict with
+    the number of hits, misses, evictions, and the current size (in entries and
+    approximate bytes) of the cache, and a cache_clear() function that empties
+    the cache and resets the counters.
+    """
+    cache = OrderedDict()
+    stats = {}
+
+    def cache_clear():
+        cache.clear()
+        stats.update(hits=0, misses=0, evictions=0, bytes=0)
+
+    def cache_info():
+        return dict(stats, size=len(cache))
+
+    @functools.wraps(function)
+    def wrapper(*args):
+        if not CACHE_SETTINGS['enabled']:
+            return function(*args)
+        if args in cache:
+            stats['hits'] += 1
+            cache.move_to_end(args)
+            return cache[args][0]
+        stats['misses'] += 1
+        result = function(*args)
+        entry_bytes = _approximate_size(args) + _approximate_size(result)
+        cache[args] = (result, entry_bytes)
+        stats['bytes'] += entry_bytes
+        # Now drop the oldest entries until the cache fits in its bounds
+        maxsize = CACHE_SETTINGS['maxsize']
+        maxbytes = CACHE_SETTINGS['maxbytes']
+        while ((maxsize is not None and len(cache) > maxsize)
+               or (maxbytes is not None and stats['bytes'] > maxbytes)):
+            _, (_, evicted_bytes) = cache.popitem(last=False)
+            stats['bytes'] -= evicted_bytes
+            stats['evictions'] += 1
+        return result
+
+    cache_clear()
+    wrapper.cache_clear = cache_clear
+    wrapper.cache_info = cache_info
+    CACHED_FUNCTIONS.append(wrapper)
+    return wrapper
+
+def configure_caches(enabled=True, maxsize=1024, maxbytes=None):
+    """Change the settings of all the bounded caches
+
+    This function updates CACHE_SETTINGS (see bounded_cache()) and clears all
+    the caches so that they start fresh with the new settings.
+    """
+    CACHE_SETTINGS.update(enabled=enabled, maxsize=maxsize, maxbytes=maxbytes)
+    for cached_function in CACHED_FUNCTIONS:
+        cached_function.cache_clear()
+
+def print_cache_stats():
+    """Print the hit, miss, and eviction counts of all the bounded caches"""
+    for cached_function in CACHED_FUNCTIONS:
+        info = cached_function.cache_info()
+        print(f'{cached_function.__name__}: '
+              f'{info["hits"]} hits, '
+              f'{info["misses"]} misses, '
+              f'{info["evictions"]} evictions, '
+              f'{info["size"]} entries (~{info["bytes"]} bytes)')
+
+@bounded_cache
 def rotate_right(platform):
     """Return a left rotation of the platform
 
@@ -18,7 +118,7 @@ def rotate_right(platform):
             rotated[i] += char
     return rotated
 
-@functools.cache
+@bounded_cache
 def rotate_left(platform):
     """Return a right rotation of the platform
 
@@ -32,7 +132,7 @@ def rotate_left(platform):
             rotated[i] += char
     return rotated
 
-@functools.cache
+@bounded_cache
 def rotate_180(platform):
     """Return a 180 degree rotation of the platform
 
@@ -41,7 +141,7 @@ def rotate_180(platform):
     """
     return [line[::-1] for line in reversed(platform)]
 
-@functools.cache
+@bounded_cache
 def process_line(line):
     """Return the new line after shifting westward
 
@@ -64,7 +164,7 @@ def process_line(line):
         shifted.append('O' * num_Os + '.' * num_dots)
     return '#'.join(shifted)
 
-@functools.cache
+@bounded_cache
 def rotate_and_tilt(platform):
     """Return the rotated left-tilted platform state
 
@@ -90,6 +190,39 @@ def compute_total_load(platform):
                 total_load += i + 1
     return total_load
 
+def simulate_tilts(platform, num_tilts):
+    """Return the platform state after rotating and tilting it many times
+
+    This function accepts a platform (already rotated so that the first
+    rotation will make the north edge the left edge, see
+    compute_post_shifting_load()) and calls rotate_and_tilt() on it num_tilts
+    times. Since every step does the exact same thing, as soon as a state shows
+    up a second time the states from then on repeat forever. So every state
+    seen is remembered along with the step it was seen at and, as soon as a
+    repeat is found, this function jumps straight to the final state.
+
+    It returns a tuple of the final platform state, the step at which the cycle
+    starts (the cycle offset), and the cycle length. If no cycle was found
+    before num_tilts steps, the offset and length are both None.
+    """
+    platform = tuple(platform)
+    # Keep track of the step at which each state was seen along with the list
+    # of states in order so that the final state can be looked up
+    seen = {platform: 0}
+    history = [platform]
+    for step in range(1, num_tilts + 1):
+        platform = tuple(rotate_and_tilt(platform))
+        if platform in seen:
+            # Found a cycle
+            cycle_start = seen[platform]
+            cycle_length = step - cycle_start
+            # Figure out where in the cycle the last step lands
+            final_step = cycle_start + (num_tilts - cycle_start) % cycle_length
+            return history[final_step], cycle_start, cycle_length
+        seen[platform] = step
+        history.append(platform)
+    return platform, None, None
+
 def compute_post_shifting_load(platform, num_tilts):
     """Return the total load after shifting
 
@@ -107,9 +240,8 @@ def compute_post_shifting_load(platform, num_tilts):
     # This involves flipping everything
     platform = rotate_180(tuple(platform))
     # Now begin rotating and tilting
-    for _ in tqdm(range(num_tilts)):
-        # Rotate right and tilt the platform to the new left
-        platform = rotate_and_tilt(tuple(platform))
+    # Each step rotates right and tilts the platform to the new left
+    platform, _, _ = simulate_tilts(platform, num_tilts)
     # Here is the direction the left edge corresponds to after all these rotations:
     # - 1: north
     # - 2: west
@@ -131,6 +263,146 @@ def compute_post_shifting_load(platform, num_tilts):
     # Now compute and return the load on the north (left) end
     return compute_total_load(platform)
 
+def platform_to_array(platform):
+    """Return the platform as a NumPy array
+
+    This function accepts the platform as a list of strings and returns a 2D
+    uint8 array where empty spaces are EMPTY, rounded rocks are ROUND_ROCK and
+    cube-shaped rocks are CUBE_ROCK. Unlike the string functions above, the
+    array keeps north at the top (row 0) and west on the left (column 0).
+    """
+    chars = np.frombuffer(''.join(platform).encode(), dtype=np.uint8)
+    chars = chars.reshape((len(platform), -1))
+    grid = np.full(chars.shape, EMPTY, dtype=np.uint8)
+    grid[chars == ord('O')] = ROUND_ROCK
+    grid[chars == ord('#')] = CUBE_ROCK
+    return grid
+
+def _tilt_towards_start(grid):
+    """Tilt the grid in place so that the rounded rocks move to row 0
+
+    This function accepts a 2D array (or a view into one) and moves all the
+    rounded rocks in each column as far towards row 0 as they can go. Instead
+    of moving rocks one at a time, each column is split into segments between
+    the cube-shaped rocks. The number of rounded rocks in each segment is
+    counted and then the segment is refilled with that many rounded rocks at
+    its start followed by empty spaces.
+    """
+    num_rows, num_cols = grid.shape
+    cubes = grid == CUBE_ROCK
+    rows = np.arange(num_rows, dtype=np.int32)[:, None]
+    # Find the row each segment starts at, i.e., one past the last cube rock
+    # at or above each cell (or row 0 if there isn't one)
+    segment_starts = np.maximum.accumulate(
+            np.where(cubes, rows + 1, 0),
+            axis=0,
+            )
+    # Give every segment in the grid a unique label
+    labels = segment_starts * num_cols + np.arange(num_cols, dtype=np.int32)
+    # Count the rounded rocks in each segment
+    counts = np.bincount(
+            labels[grid == ROUND_ROCK],
+            minlength=(num_rows + 1) * num_cols,
+            )
+    # The first count cells of each segment are now rounded rocks
+    rounded = ~cubes & (rows - segment_starts < counts[labels])
+    grid[...] = np.where(cubes, CUBE_ROCK, np.where(rounded, ROUND_ROCK, EMPTY))
+
+def tilt_array(grid, direction):
+    """Tilt the platform array in place in a direction
+
+    This function accepts the platform as an array (see platform_to_array())
+    and a direction (one of 'north', 'west', 'south' or 'east') and moves all
+    the rounded rocks as far as they can go in that direction. The grid is
+    never rotated. Instead, a flipped or transposed view of the grid is tilted
+    so that all the changes are written directly into the original array.
+    """
+    match direction:
+        case 'north':
+            view = grid
+        case 'south':
+            view = grid[::-1, :]
+        case 'west':
+            view = grid.T
+        case 'east':
+            view = grid[:, ::-1].T
+        case default:
+            raise ValueError(f'Unknown direction "{direction}"')
+    _tilt_towards_start(view)
+    return grid
+
+def spin_cycle_array(grid):
+    """Tilt the platform array north, then west, then south, and then east"""
+    for direction in ('north', 'west', 'south', 'east'):
+        tilt_array(grid, direction)
+    return grid
+
+def compute_north_load_array(grid):
+    """Return the total load on the north side of the platform array
+
+    This function does the same thing as compute_total_load() but for the
+    platform array, where north is at the top. It does not tilt the platform.
+    """
+    # The load of a rock is given by its distance from the southern edge
+    row_loads = np.arange(grid.shape[0], 0, -1)
+    return int(((grid == ROUND_ROCK).sum(axis=1) * row_loads).sum())
+
+def compute_post_spinning_load_array(platform, num_cycles):
+    """Return the total load after spin cycles using the platform array
+
+    This function accepts the distribution of rocks on the platform, runs
+    num_cycles spin cycles on it (see spin_cycle_array()), and computes the
+    total load on the north side. Like simulate_tilts(), it remembers every
+    state it has seen (as the raw bytes of the grid) and jumps straight to the
+    final state once a state repeats.
+    """
+    grid = platform_to_array(platform)
+    seen = {grid.tobytes(): 0}
+    history = [grid.tobytes()]
+    for cycle in range(1, num_cycles + 1):
+        state = spin_cycle_array(grid).tobytes()
+        if state in seen:
+            cycle_start = seen[state]
+            cycle_length = cycle - cycle_start
+            final_cycle = (cycle_start
+                           + (num_cycles - cycle_start) % cycle_length)
+            grid = np.frombuffer(history[final_cycle], dtype=np.uint8)
+            grid = grid.reshape((len(platform), len(platform[0])))
+            break
+        seen[state] = cycle
+        history.append(state)
+    return compute_north_load_array(grid)
+
+def benchmark_tilts(platform, scale=1, repeats=3):
+    """Compare the speed of the string and array tilting methods
+
+    This function tiles the platform scale times in each direction (so a 100 x
+    100 platform with scale 20 becomes 2000 x 2000) and then times a single
+    spin cycle (four tilts) using both rotate_and_tilt() and
+    spin_cycle_array(). The caches on the string functions are cleared before
+    each run so that they don't hide the actual work. It prints and returns
+    the best time for each method in seconds.
+    """
+    platform = [line * scale for line in platform] * scale
+    string_times = []
+    array_times = []
+    for _ in range(repeats):
+        for cached_function in CACHED_FUNCTIONS:
+            cached_function.cache_clear()
+        start_time = time.perf_counter()
+        state = tuple(rotate_180(tuple(platform)))
+        for _ in range(4):
+            state = tuple(rotate_and_tilt(state))
+        string_times.append(time.perf_counter() - start_time)
+        grid = platform_to_array(platform)
+        start_time = time.perf_counter()
+        spin_cycle_array(grid)
+        array_times.append(time.perf_counter() - start_time)
+    size = f'{len(platform)} x {len(platform[0])}'
+    print(f'String spin cycle ({size}): {min(string_times):.4f} s')
+    print(f'Array spin cycle ({size}): {min(array_times):.4f} s')
+    return min(string_times), min(array_times)
+
 def read_data(filename):
     """Read the data from the file"""
     with open(filename, 'r') as infile:
@@ -148,4 +420,18 @@ def main(filename):
 
 if __name__ == "__main__":
     filename = sys.argv[1]
-    platform = main(filename)
+    mode = sys.argv[2] if len(sys.argv) > 2 else 'cache'
+    match mode:
+        case 'benchmark':
+            scale = int(sys.argv[3]) if len(sys.argv) > 3 else 1
+            benchmark_tilts(read_data(filename), scale=scale)
+        case 'cache':
+            platform = main(filename)
+        case 'stats':
+            platform = main(filename)
+            print_cache_stats()
+        case 'nocache':
+            configure_caches(enabled=False)
+            platform = main(filename)
+        case default:
+            raise ValueError(f'Unknown mode "{mode}"')